@@ -3,35 +3,57 @@ HTTP Server wrapper for MCP Obsidian
 Allows HTTP access to MCP tools for integration with n8n and other HTTP clients
 Supports both REST API and SSE (Server-Sent Events) for MCP protocol
 """
-import json
 import logging
 from typing import Any, Dict
-from fastapi import FastAPI, HTTPException, Request
+import orjson
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import JSONResponse, StreamingResponse
-from pydantic import BaseModel
 import os
+import sys
 from dotenv import load_dotenv
 import asyncio
+from collections.abc import Sequence
+from contextlib import asynccontextmanager
+from types import MappingProxyType
+from mcp.types import TextContent, ImageContent, EmbeddedResource
 
 load_dotenv()
 
 from . import tools
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (force: importing the package already configured it for the stdio server)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING").upper(), force=True)
 logger = logging.getLogger("mcp-obsidian-http")
 
+class ORJSONResponse(JSONResponse):
+    """JSONResponse that encodes its body with orjson instead of stdlib json"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the shared SSE keep-alive ticker for the lifetime of the app"""
+    ticker_task = asyncio.create_task(_sse_keepalive_ticker())
+    try:
+        yield
+    finally:
+        ticker_task.cancel()
+
+
 app = FastAPI(
     title="MCP Obsidian HTTP API",
     description="HTTP wrapper for MCP Obsidian tools",
-    version="0.2.1"
+    version="0.2.1",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Initialize tool handlers
 tool_handlers = {}
 
 def add_tool_handler(tool_class: tools.ToolHandler):
-    global tool_handlers
     tool_handlers[tool_class.name] = tool_class
 
 # Register all tools
@@ -49,48 +71,116 @@ add_tool_handler(tools.PeriodicNotesToolHandler())
 add_tool_handler(tools.RecentPeriodicNotesToolHandler())
 add_tool_handler(tools.RecentChangesToolHandler())
 
+# Registration is done; expose the registry read-only to request handlers
+TOOL_HANDLERS = MappingProxyType(tool_handlers)
+
+# The tool set is fixed at import time, so build the descriptions once
+TOOLS_LIST_CACHE = [
+    {
+        "name": tool_desc.name,
+        "description": tool_desc.description,
+        "inputSchema": tool_desc.inputSchema
+    }
+    for tool_desc in (handler.get_tool_description() for handler in TOOL_HANDLERS.values())
+]
+TOOLS_LIST_BYTES = orjson.dumps({"tools": TOOLS_LIST_CACHE})
+
+# Static response bodies, encoded once at import
+ROOT_BYTES = orjson.dumps({
+    "service": "MCP Obsidian HTTP API",
+    "version": "0.2.1",
+    "endpoints": {
+        "health": "/health",
+        "list_tools": "/tools/list",
+        "call_tool": "/tools/call"
+    }
+})
+HEALTH_BYTES = orjson.dumps({"status": "healthy", "service": "mcp-obsidian"})
+INIT_RESULT = {
+    "protocolVersion": "2024-11-05",
+    "capabilities": {
+        "tools": {}
+    },
+    "serverInfo": {
+        "name": "mcp-obsidian",
+        "version": "0.2.1"
+    }
+}
+INIT_RESULT_BYTES = orjson.dumps(INIT_RESULT)
+
+
+def _unwrap_tool_result(result: Sequence[TextContent | ImageContent | EmbeddedResource]) -> Any:
+    """Decode the first TextContent of a tool result as JSON, falling back to its plain text"""
+    if result and isinstance(result[0], TextContent):
+        result_text = result[0].text
+        try:
+            return orjson.loads(result_text)
+        except orjson.JSONDecodeError:
+            return result_text
+    return result
+
+
+# List results longer than this are streamed instead of buffered in full
+STREAM_RESULT_THRESHOLD = 64
+# Flush the streaming buffer once it grows past this many bytes
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+async def _stream_tool_result(tool_name: str, items: list):
+    """Yield a call_tool response body for a list result, encoding one item at a time"""
+    buf = bytearray(b'{"success":true,"tool":')
+    buf += orjson.dumps(tool_name)
+    buf += b',"result":['
+    for index, item in enumerate(items):
+        if index:
+            buf += b','
+        buf += orjson.dumps(item)
+        if len(buf) >= STREAM_CHUNK_SIZE:
+            yield bytes(buf)
+            buf.clear()
+    buf += b']}'
+    yield bytes(buf)
 
-class ToolCallRequest(BaseModel):
-    name: str
-    arguments: Dict[str, Any]
+
+# Request body schema for /tools/call, kept for the OpenAPI docs now that the body is parsed by hand
+TOOL_CALL_REQUEST_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "arguments": {"type": "object"}
+    },
+    "required": ["name"]
+}
+
+
+def _bad_request(message: str) -> ORJSONResponse:
+    """Build a 400 response for a malformed /tools/call body"""
+    return ORJSONResponse(status_code=400, content={"success": False, "error": message})
 
 
 @app.get("/")
-async def root():
+async def root() -> Response:
     """Root endpoint"""
-    return {
-        "service": "MCP Obsidian HTTP API",
-        "version": "0.2.1",
-        "endpoints": {
-            "health": "/health",
-            "list_tools": "/tools/list",
-            "call_tool": "/tools/call"
-        }
-    }
+    return Response(ROOT_BYTES, media_type="application/json")
 
 
 @app.get("/health")
-async def health():
+async def health() -> Response:
     """Health check endpoint"""
-    return {"status": "healthy", "service": "mcp-obsidian"}
+    return Response(HEALTH_BYTES, media_type="application/json")
 
 
 @app.get("/tools/list")
-async def list_tools():
+async def list_tools() -> Response:
     """List all available tools"""
-    tools_list = []
-    for name, handler in tool_handlers.items():
-        tool_desc = handler.get_tool_description()
-        tools_list.append({
-            "name": tool_desc.name,
-            "description": tool_desc.description,
-            "inputSchema": tool_desc.inputSchema
-        })
-    return {"tools": tools_list}
-
-
-@app.post("/tools/call")
-async def call_tool(request: ToolCallRequest):
+    return Response(TOOLS_LIST_BYTES, media_type="application/json")
+
+
+@app.post(
+    "/tools/call",
+    openapi_extra={"requestBody": {"required": True, "content": {"application/json": {"schema": TOOL_CALL_REQUEST_SCHEMA}}}}
+)
+async def call_tool(request: Request) -> Response:
     """
     Call an MCP tool
     
@@ -104,40 +194,83 @@ async def call_tool(request: ToolCallRequest):
     }
     """
     try:
-        logger.info(f"Calling tool: {request.name} with arguments: {request.arguments}")
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        return _bad_request(f"Invalid JSON body: {str(e)}")
+    if not isinstance(body, dict):
+        return _bad_request("Request body must be a JSON object")
+    
+    name = body.get("name")
+    arguments = body.get("arguments")
+    if arguments is None:
+        arguments = {}
+    if not isinstance(name, str) or not name:
+        return _bad_request("Missing tool name")
+    if not isinstance(arguments, dict):
+        return _bad_request("arguments must be a JSON object")
+    
+    try:
+        logger.debug("Calling tool: %s args=%s", name, arguments)
         
-        if request.name not in tool_handlers:
-            raise HTTPException(
-                status_code=404, 
-                detail=f"Tool '{request.name}' not found. Available tools: {list(tool_handlers.keys())}"
+        handler = TOOL_HANDLERS.get(name)
+        if handler is None:
+            logger.debug("Unknown tool requested: %s", name)
+            return ORJSONResponse(
+                status_code=404,
+                content={
+                    "success": False,
+                    "error": f"Tool '{name}' not found. Available tools: {list(TOOL_HANDLERS.keys())}"
+                }
             )
         
-        handler = tool_handlers[request.name]
-        result = handler.run_tool(request.arguments)
+        result = await asyncio.to_thread(handler.run_tool, arguments)
         
-        # Convert result to dict if it's a list of TextContent objects
-        if result and hasattr(result[0], 'text'):
-            result_text = result[0].text
-            try:
-                # Try to parse as JSON
-                result_data = json.loads(result_text)
-            except:
-                # If not JSON, return as plain text
-                result_data = result_text
-        else:
-            result_data = result
+        result_data = _unwrap_tool_result(result)
+        
+        if isinstance(result_data, list) and len(result_data) > STREAM_RESULT_THRESHOLD:
+            return StreamingResponse(
+                _stream_tool_result(name, result_data),
+                media_type="application/json"
+            )
         
-        return JSONResponse(content={
+        payload = {
             "success": True,
-            "tool": request.name,
+            "tool": name,
             "result": result_data
-        })
+        }
+        return Response(orjson.dumps(payload), media_type="application/json")
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error calling tool {request.name}: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error calling tool %s: %s", name, e, exc_info=True)
+        return ORJSONResponse(status_code=500, content={"success": False, "error": str(e)})
+
+
+# Seconds between SSE keep-alive comments; proxies typically drop idle streams after 30-60s
+SSE_KEEPALIVE_INTERVAL = float(os.getenv("SSE_KEEPALIVE_INTERVAL", "15"))
+# Constant SSE frames, yielded as-is so idle clients cost no per-frame allocation
+CONNECT_FRAME = b'data: {"type":"connection","status":"connected"}\n\n'
+KEEPALIVE_FRAME = b": keep-alive\n\n"
+
+
+# One queue per connected /sse client; a single ticker task fans keep-alives out to all of them
+SSE_CLIENTS: set[asyncio.Queue[bytes | None]] = set()
+
+
+async def _sse_keepalive_ticker() -> None:
+    """Queue a keep-alive for every idle SSE client once per interval"""
+    while True:
+        await asyncio.sleep(SSE_KEEPALIVE_INTERVAL)
+        for queue in SSE_CLIENTS:
+            if queue.empty():
+                queue.put_nowait(KEEPALIVE_FRAME)
+
+
+async def _wait_disconnect(request: Request) -> None:
+    """Return once the client side of the request has disconnected"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
 
 
 @app.get("/sse")
@@ -147,21 +280,28 @@ async def sse_endpoint(request: Request):
     Implements Server-Sent Events for streaming MCP messages
     """
     async def event_generator():
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        # A None in the queue signals that the client has gone away
+        disconnect_task = asyncio.create_task(_wait_disconnect(request))
+        disconnect_task.add_done_callback(lambda _: queue.put_nowait(None))
+        SSE_CLIENTS.add(queue)
         try:
             # Send initial connection message
-            yield f"data: {json.dumps({'type': 'connection', 'status': 'connected'})}\n\n"
+            yield CONNECT_FRAME
             
-            # Keep connection alive and wait for disconnect
+            # Relay keep-alives from the ticker until the client disconnects
             while True:
-                if await request.is_disconnected():
+                chunk = await queue.get()
+                if chunk is None:
                     break
-                await asyncio.sleep(1)
-                # Send keep-alive ping
-                yield f": keep-alive\n\n"
+                yield chunk
                 
         except Exception as e:
-            logger.error(f"SSE error: {str(e)}")
-            yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
+            logger.error("SSE error: %s", e)
+            yield b"data: " + orjson.dumps({"type": "error", "message": str(e)}) + b"\n\n"
+        finally:
+            SSE_CLIENTS.discard(queue)
+            disconnect_task.cancel()
     
     return StreamingResponse(
         event_generator(),
@@ -174,6 +314,84 @@ async def sse_endpoint(request: Request):
     )
 
 
+def _jsonrpc_ok(request_id: Any, result: Any) -> ORJSONResponse:
+    """Build a JSON-RPC 2.0 success envelope"""
+    return ORJSONResponse(content={
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "result": result
+    })
+
+
+def _jsonrpc_err(request_id: Any, code: int, message: str) -> ORJSONResponse:
+    """Build a JSON-RPC 2.0 error envelope"""
+    return ORJSONResponse(
+        status_code=200,
+        content={
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "error": {
+                "code": code,
+                "message": message
+            }
+        }
+    )
+
+
+async def _handle_tools_list(request_id: Any, params: Dict[str, Any]) -> ORJSONResponse:
+    """Handle the MCP tools/list method"""
+    return _jsonrpc_ok(request_id, {"tools": TOOLS_LIST_CACHE})
+
+
+async def _handle_tools_call(request_id: Any, params: Dict[str, Any]) -> Response:
+    """Handle the MCP tools/call method"""
+    tool_name = params.get("name")
+    arguments = params.get("arguments", {})
+    
+    handler = TOOL_HANDLERS.get(tool_name)
+    if handler is None:
+        return _jsonrpc_err(request_id, -32601, f"Tool not found: {tool_name}")
+    
+    result = await asyncio.to_thread(handler.run_tool, arguments)
+    
+    # Tool text (JSON or not) is passed through as-is rather than parsed and re-encoded
+    if result and isinstance(result[0], TextContent):
+        body = (
+            b'{"jsonrpc":"2.0","id":' + orjson.dumps(request_id)
+            + b',"result":{"content":[{"type":"text","text":' + orjson.dumps(result[0].text) + b'}]}}'
+        )
+        return Response(body, media_type="application/json")
+    
+    # Empty or non-text results are encoded as a JSON array of their content items
+    return _jsonrpc_ok(request_id, {
+        "content": [
+            {
+                "type": "text",
+                "text": orjson.dumps([item.model_dump(mode="json") for item in result]).decode()
+            }
+        ]
+    })
+
+
+async def _handle_initialize(request_id: Any, params: Dict[str, Any]) -> Response:
+    """Handle MCP initialization"""
+    body = b'{"jsonrpc":"2.0","id":' + orjson.dumps(request_id) + b',"result":' + INIT_RESULT_BYTES + b'}'
+    return Response(body, media_type="application/json")
+
+
+# JSON-RPC method names, interned so the dispatch keys are canonical string objects
+_M_LIST = sys.intern("tools/list")
+_M_CALL = sys.intern("tools/call")
+_M_INIT = sys.intern("initialize")
+
+# JSON-RPC method name -> handler, built once at import
+METHOD_DISPATCH = {
+    _M_LIST: _handle_tools_list,
+    _M_CALL: _handle_tools_call,
+    _M_INIT: _handle_initialize,
+}
+
+
 @app.post("/sse")
 async def sse_call_tool(request: Request):
     """
@@ -181,7 +399,10 @@ async def sse_call_tool(request: Request):
     This endpoint receives JSON-RPC 2.0 formatted requests
     """
     try:
-        body = await request.json()
+        try:
+            body = orjson.loads(await request.body())
+        except orjson.JSONDecodeError as e:
+            return _jsonrpc_err(None, -32700, f"Parse error: {str(e)}")
         
         # JSON-RPC 2.0 format
         if "jsonrpc" in body and body["jsonrpc"] == "2.0":
@@ -189,111 +410,26 @@ async def sse_call_tool(request: Request):
             params = body.get("params", {})
             request_id = body.get("id")
             
-            # Handle different MCP methods
-            if method == "tools/list":
-                tools_list = []
-                for name, handler in tool_handlers.items():
-                    tool_desc = handler.get_tool_description()
-                    tools_list.append({
-                        "name": tool_desc.name,
-                        "description": tool_desc.description,
-                        "inputSchema": tool_desc.inputSchema
-                    })
-                
-                return JSONResponse(content={
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {"tools": tools_list}
-                })
-            
-            elif method == "tools/call":
-                tool_name = params.get("name")
-                arguments = params.get("arguments", {})
-                
-                if tool_name not in tool_handlers:
-                    return JSONResponse(
-                        status_code=200,
-                        content={
-                            "jsonrpc": "2.0",
-                            "id": request_id,
-                            "error": {
-                                "code": -32601,
-                                "message": f"Tool not found: {tool_name}"
-                            }
-                        }
-                    )
-                
-                handler = tool_handlers[tool_name]
-                result = handler.run_tool(arguments)
-                
-                # Convert result to proper format
-                if result and hasattr(result[0], 'text'):
-                    result_text = result[0].text
-                    try:
-                        result_data = json.loads(result_text)
-                    except:
-                        result_data = result_text
-                else:
-                    result_data = result
-                
-                return JSONResponse(content={
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps(result_data) if isinstance(result_data, (dict, list)) else result_data
-                            }
-                        ]
-                    }
-                })
-            
-            elif method == "initialize":
-                # Handle MCP initialization
-                return JSONResponse(content={
-                    "jsonrpc": "2.0",
-                    "id": request_id,
-                    "result": {
-                        "protocolVersion": "2024-11-05",
-                        "capabilities": {
-                            "tools": {}
-                        },
-                        "serverInfo": {
-                            "name": "mcp-obsidian",
-                            "version": "0.2.1"
-                        }
-                    }
-                })
-            
-            else:
-                return JSONResponse(
-                    status_code=200,
-                    content={
-                        "jsonrpc": "2.0",
-                        "id": request_id,
-                        "error": {
-                            "code": -32601,
-                            "message": f"Method not found: {method}"
-                        }
-                    }
-                )
+            handler_fn = METHOD_DISPATCH.get(method) if isinstance(method, str) else None
+            if handler_fn is None:
+                return _jsonrpc_err(request_id, -32601, f"Method not found: {method}")
+            return await handler_fn(request_id, params)
         
         # Fallback to simple format
         tool_name = body.get("name")
         arguments = body.get("arguments", {})
         
-        if tool_name not in tool_handlers:
+        handler = TOOL_HANDLERS.get(tool_name)
+        if handler is None:
             raise HTTPException(status_code=404, detail=f"Tool not found: {tool_name}")
         
-        handler = tool_handlers[tool_name]
-        result = handler.run_tool(arguments)
+        result = await asyncio.to_thread(handler.run_tool, arguments)
         
-        return JSONResponse(content={"success": True, "result": result})
+        return ORJSONResponse(content={"success": True, "result": result})
         
     except Exception as e:
-        logger.error(f"Error in SSE call: {str(e)}", exc_info=True)
-        return JSONResponse(
+        logger.error("Error in SSE call: %s", e, exc_info=True)
+        return ORJSONResponse(
             status_code=500,
             content={
                 "jsonrpc": "2.0",
@@ -308,4 +444,15 @@ async def sse_call_tool(request: Request):
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("HTTP_PORT", "3000"))
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    workers = int(os.getenv("HTTP_WORKERS", "1"))
+    # Multiple workers need an import string so each process builds its own app
+    uvicorn.run(
+        "mcp_obsidian.http_server:app" if workers > 1 else app,
+        host="0.0.0.0",
+        port=port,
+        # "auto" picks uvloop and httptools when the [http] extra is installed
+        loop="auto",
+        http="auto",
+        workers=workers,
+        log_level="info"
+    )